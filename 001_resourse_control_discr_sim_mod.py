@@ -1,233 +1,185 @@
-import random
-import simpy
-import statistics
-import matplotlib.pyplot as plt
+import argparse
+import os
+import matplotlib
+import numpy as np
 import pandas as pd
 import seaborn as sns
 
-def run_simulation():
+HEADLESS = bool(os.environ.get('HEADLESS'))  # Пакетный запуск: графики только сохраняются в файлы
+if HEADLESS:
+    matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+from run_sweep import METRICS, load_results, sweep
+from run_sweep import RESULTS_FILE as NPZ_RESULTS_FILE  # Результаты run_sweep.py (без pandas)
+
+RESULTS_FILE = 'sweep.parquet'  # Файл с таблицей результатов расчёта
+PLOTS_DIR = 'plots'  # Каталог для сохранения графиков
+
+
+def results_frame(results):
     """
-    Функция для запуска симуляции контакт-центра с динамическим переключением между
-    базовыми и упрощёнными нейросетевыми агентами, используя управление доступностью агентов.
-    QoE вычисляется как функция от типа модели и времени ожидания.
+    Результаты sweep (или run_sweep.load_results) в виде таблицы pandas: по строке на пару
+    (порог, уровень нагрузки), по столбцу на каждую метрику из METRICS.
+    """
+    arrival_rates = results['arrival_rates']
+    queue_thresholds = results['queue_thresholds']
+    columns = {
+        'threshold': np.repeat(queue_thresholds, len(arrival_rates)),
+        'arrival_rate': np.tile(arrival_rates, len(queue_thresholds)),
+    }
+    for k, name in enumerate(METRICS):
+        columns[name] = results['results'][:, :, k].ravel()
+    return pd.DataFrame(columns)
+
+
+def add_threshold_lines(ax, lines, queue_thresholds):
     """
-    # Параметры симуляции
-    SIM_TIME = 1000  # Продолжительность симуляции (единицы времени)
-    NUM_AGENTS_FULL = 10  # Количество агентов при использовании базовых моделей
-    NUM_AGENTS_SIMPLIFIED = 20  # Количество агентов при использовании упрощённых моделей
-    AVG_PROCESSING_TIME = 1  # Среднее время обработки запроса (единицы времени)
-    QUEUE_THRESHOLD_TO_BASE = 0  # Порог для переключения на базовые агенты
-    QoE_FULL_BASE = 1.0  # Базовое QoE при использовании базовых моделей
-    QoE_SIMPLIFIED_BASE = 0.8  # Базовое QoE при использовании упрощённых моделей
-    ALPHA = 0.05  # Коэффициент влияния задержки на QoE
-
-    # Уровни нагрузки для симуляции
-    arrival_rates = [0.1 * i for i in range(1, 10)] + list(range(1, 21))  # От 0.1 до 20
-
-    # Значения порога для переключения на упрощённые агенты
-    queue_thresholds = [1, 3, 5, 7, 10]  # Можно изменить или добавить значения
-
-    # Хранилища для результатов по всем порогам
-    results_waiting_times = {}  # Ключ: порог, Значение: список средних задержек
-    results_qoe_values = {}  # Ключ: порог, Значение: список средних QoE
-    results_simplified_agents = {}  # Ключ: порог, Значение: список средних дополнительных агентов
-
-    # Основной цикл по значениям порога
-    for QUEUE_THRESHOLD_TO_SIMP in queue_thresholds:
-        # Хранилища для результатов текущего порога
-        average_waiting_times = []
-        average_qoe_values = []
-        simplified_agent_counts = []
-
-        print(f"\nСимуляция для QUEUE_THRESHOLD_TO_SIMP = {QUEUE_THRESHOLD_TO_SIMP}\n")
-
-        # Цикл по уровням нагрузки
-        for REQUEST_ARRIVAL_RATE in arrival_rates:
-            # Инициализация метрик для текущей нагрузки
-            qoe_values = []
-            waiting_times = []
-            time_points = []
-            simplified_agent_counts_over_time = []
-            time_qoe = []
-            qoe_over_time = []
-
-            # Создание среды симуляции
-            env = simpy.Environment()
-
-            # Начальные значения
-            agent_type = 'full'  # Текущий тип агентов ('full' или 'simplified')
-            busy_agents = 0  # Счётчик занятых агентов
-            available_agents = NUM_AGENTS_FULL  # Текущее количество доступных агентов
-
-            # Создание ресурса агентов с максимальной ёмкостью
-            agent_resource = simpy.Resource(env, capacity=NUM_AGENTS_SIMPLIFIED)
-
-            # Функция обработки каждого запроса
-            def process_request(env, request_id):
-                nonlocal busy_agents
-                arrival_time = env.now  # Время прибытия запроса
-
-                with agent_resource.request() as req:
-                    yield req  # Ожидание доступного агента в очереди ресурса
-
-                    # Ждём, пока будет доступен агент
-                    while busy_agents >= available_agents:
-                        yield env.timeout(0.01)  # Небольшая пауза перед повторной проверкой
-
-                    busy_agents += 1  # Агент занят
-
-                    waiting_time = env.now - arrival_time  # Время ожидания запроса
-                    waiting_times.append(waiting_time)  # Сохранение времени ожидания
-
-                    # Время обработки запроса
-                    processing_time = random.expovariate(1.0 / AVG_PROCESSING_TIME)
-
-                    # Определение базового QoE в зависимости от типа агента
-                    if agent_type == 'full':
-                        base_qoe = QoE_FULL_BASE
-                    else:
-                        base_qoe = QoE_SIMPLIFIED_BASE
-
-                    # Вычисление QoE с учётом задержки
-                    qoe = max(0, base_qoe - ALPHA * waiting_time)  # QoE не может быть отрицательным
-                    qoe_values.append(qoe)
-
-                    yield env.timeout(processing_time)  # Обработка запроса
-
-                    busy_agents -= 1  # Агент освободился
-
-            # Функция генерации входящих запросов
-            def generate_requests(env):
-                request_id = 0
-                while True:
-                    # Интервал между запросами
-                    inter_arrival_time = random.expovariate(REQUEST_ARRIVAL_RATE)
-                    yield env.timeout(inter_arrival_time)
-                    request_id += 1
-                    env.process(process_request(env, request_id))  # Запуск процесса обработки запроса
-
-            # Функция мониторинга длины очереди и переключения типов агентов
-            def monitor_queue(env):
-                nonlocal agent_type, available_agents
-                while True:
-                    queue_length = len(agent_resource.queue)  # Текущая длина очереди
-
-                    # Переключение на упрощённые агенты
-                    if queue_length > QUEUE_THRESHOLD_TO_SIMP and agent_type != 'simplified':
-                        agent_type = 'simplified'
-                        available_agents = NUM_AGENTS_SIMPLIFIED  # Увеличиваем доступное количество агентов
-                        print(f"Переключение на упрощённые агенты в момент времени {env.now} при нагрузке {REQUEST_ARRIVAL_RATE}")
-                    # Переключение обратно на базовые агенты
-                    elif (queue_length <= QUEUE_THRESHOLD_TO_BASE and agent_type != 'full' and
-                          busy_agents <= NUM_AGENTS_FULL):
-                        agent_type = 'full'
-                        available_agents = NUM_AGENTS_FULL  # Уменьшаем доступное количество агентов
-                        print(f"Переключение на базовые агенты в момент времени {env.now} при нагрузке {REQUEST_ARRIVAL_RATE}")
-
-                    # Сохранение данных для графиков
-                    time_points.append(env.now)
-                    num_simplified_agents = available_agents - NUM_AGENTS_FULL if agent_type == 'simplified' else 0
-                    simplified_agent_counts_over_time.append(num_simplified_agents)
-
-                    yield env.timeout(1)  # Проверка состояния каждые 1 единицу времени
-
-            # Функция мониторинга QoE во времени
-            def monitor_qoe(env):
-                while True:
-                    current_time = env.now
-                    current_qoe = sum(qoe_values) / len(qoe_values) if qoe_values else QoE_FULL_BASE
-                    time_qoe.append(current_time)
-                    qoe_over_time.append(current_qoe)
-                    yield env.timeout(1)
-
-            # Запуск процессов симуляции
-            env.process(generate_requests(env))
-            env.process(monitor_queue(env))
-            env.process(monitor_qoe(env))
-
-            # Запуск симуляции до заданного времени
-            env.run(until=SIM_TIME)
-
-            # Вычисление средних метрик для текущей нагрузки
-            average_qoe = sum(qoe_values) / len(qoe_values) if qoe_values else QoE_FULL_BASE
-            average_waiting_time = sum(waiting_times) / len(waiting_times) if waiting_times else 0
-            average_simplified_agents = statistics.mean(simplified_agent_counts_over_time) if simplified_agent_counts_over_time else 0
-
-            # Сохранение средних значений
-            average_qoe_values.append(average_qoe)
-            average_waiting_times.append(average_waiting_time)
-            simplified_agent_counts.append(average_simplified_agents)
-
-        # Сохранение результатов для текущего порога
-        results_waiting_times[QUEUE_THRESHOLD_TO_SIMP] = average_waiting_times
-        results_qoe_values[QUEUE_THRESHOLD_TO_SIMP] = average_qoe_values
-        results_simplified_agents[QUEUE_THRESHOLD_TO_SIMP] = simplified_agent_counts
-
-    # Построение графиков по результатам симуляции для разных порогов
+    Добавление на оси линий для всех порогов одной коллекцией (LineCollection или
+    Line3DCollection для 3D-осей) и точек одним scatter вместо отдельного plot на каждый порог.
+    lines — список массивов точек формы (n, 2) или (n, 3), по одному на порог.
+    """
+    colors = plt.cm.tab10(np.arange(len(queue_thresholds)) % 10)
+    points = np.concatenate(lines)
+    point_colors = np.repeat(colors, [len(line) for line in lines], axis=0)
+
+    if points.shape[1] == 3:
+        ax.add_collection3d(Line3DCollection(lines, colors=colors))
+        ax.scatter(points[:, 0], points[:, 1], points[:, 2], c=point_colors, depthshade=False)
+    else:
+        ax.add_collection(LineCollection(lines, colors=colors))
+        ax.scatter(points[:, 0], points[:, 1], c=point_colors, s=20)
+        ax.autoscale_view()
+
+    handles = [Line2D([], [], color=color, marker='o', label=f'Порог: {t}') for color, t in zip(colors, queue_thresholds)]
+    ax.legend(handles=handles)
+
+
+def plot_sweep(df, output_dir=PLOTS_DIR):
+    """
+    Построение графиков по таблице результатов (см. results_frame) для разных порогов.
+    Графики сохраняются в output_dir; при интерактивном запуске все окна показываются разом.
+    """
+    groups = [(t, group.sort_values('arrival_rate')) for t, group in df.groupby('threshold')]
+    queue_thresholds = [t for t, _ in groups]
+
+    def lines(*columns):
+        """Точки линий по каждому порогу для заданных столбцов таблицы."""
+        return [group[list(columns)].to_numpy() for _, group in groups]
+
+    os.makedirs(output_dir, exist_ok=True)
 
     # График 1: Средняя задержка vs Интенсивность нагрузки для разных порогов
-    plt.figure()
-    for QUEUE_THRESHOLD_TO_SIMP in queue_thresholds:
-        plt.plot(arrival_rates, results_waiting_times[QUEUE_THRESHOLD_TO_SIMP], marker='o', label=f'Порог: {QUEUE_THRESHOLD_TO_SIMP}')
-    plt.title('Средняя задержка vs Интенсивность нагрузки')
-    plt.xlabel('Интенсивность нагрузки')
-    plt.ylabel('Средняя задержка')
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+    fig, ax = plt.subplots()
+    add_threshold_lines(ax, lines('arrival_rate', 'waiting_time'), queue_thresholds)
+    ax.set_title('Средняя задержка vs Интенсивность нагрузки')
+    ax.set_xlabel('Интенсивность нагрузки')
+    ax.set_ylabel('Средняя задержка')
+    ax.grid(True)
+    fig.savefig(os.path.join(output_dir, 'waiting_time_vs_load.png'))
 
     # График 2: Среднее QoE vs Интенсивность нагрузки для разных порогов
-    plt.figure()
-    for QUEUE_THRESHOLD_TO_SIMP in queue_thresholds:
-        plt.plot(arrival_rates, results_qoe_values[QUEUE_THRESHOLD_TO_SIMP], marker='o', label=f'Порог: {QUEUE_THRESHOLD_TO_SIMP}')
-    plt.title('Среднее QoE vs Интенсивность нагрузки')
-    plt.xlabel('Интенсивность нагрузки')
-    plt.ylabel('Среднее QoE')
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+    fig, ax = plt.subplots()
+    add_threshold_lines(ax, lines('arrival_rate', 'qoe'), queue_thresholds)
+    ax.set_title('Среднее QoE vs Интенсивность нагрузки')
+    ax.set_xlabel('Интенсивность нагрузки')
+    ax.set_ylabel('Среднее QoE')
+    ax.grid(True)
+    fig.savefig(os.path.join(output_dir, 'qoe_vs_load.png'))
 
     # График 3: Среднее число дополнительных агентов vs Интенсивность нагрузки для разных порогов
-    plt.figure()
-    for QUEUE_THRESHOLD_TO_SIMP in queue_thresholds:
-        plt.plot(arrival_rates, results_simplified_agents[QUEUE_THRESHOLD_TO_SIMP], marker='o', label=f'Порог: {QUEUE_THRESHOLD_TO_SIMP}')
-    plt.title('Среднее число дополнительных агентов vs Интенсивность нагрузки')
-    plt.xlabel('Интенсивность нагрузки')
-    plt.ylabel('Среднее число дополнительных агентов')
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+    fig, ax = plt.subplots()
+    add_threshold_lines(ax, lines('arrival_rate', 'simplified_agents'), queue_thresholds)
+    ax.set_title('Среднее число дополнительных агентов vs Интенсивность нагрузки')
+    ax.set_xlabel('Интенсивность нагрузки')
+    ax.set_ylabel('Среднее число дополнительных агентов')
+    ax.grid(True)
+    fig.savefig(os.path.join(output_dir, 'simplified_agents_vs_load.png'))
 
     # Дополнительно: Средняя задержка vs Среднее число дополнительных агентов для разных порогов
-    plt.figure()
-    for QUEUE_THRESHOLD_TO_SIMP in queue_thresholds:
-        plt.plot(results_simplified_agents[QUEUE_THRESHOLD_TO_SIMP], results_waiting_times[QUEUE_THRESHOLD_TO_SIMP], marker='o', label=f'Порог: {QUEUE_THRESHOLD_TO_SIMP}')
-    plt.title('Средняя задержка vs Среднее число дополнительных агентов')
-    plt.xlabel('Среднее число дополнительных агентов')
-    plt.ylabel('Средняя задержка')
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+    fig, ax = plt.subplots()
+    add_threshold_lines(ax, lines('simplified_agents', 'waiting_time'), queue_thresholds)
+    ax.set_title('Средняя задержка vs Среднее число дополнительных агентов')
+    ax.set_xlabel('Среднее число дополнительных агентов')
+    ax.set_ylabel('Средняя задержка')
+    ax.grid(True)
+    fig.savefig(os.path.join(output_dir, 'waiting_time_vs_simplified_agents.png'))
 
     # График 8: Зависимость QoE и задержки от нагрузки (3D-график) для разных порогов
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
-
-    for QUEUE_THRESHOLD_TO_SIMP in queue_thresholds:
-        ax.plot(
-            arrival_rates,
-            results_waiting_times[QUEUE_THRESHOLD_TO_SIMP],
-            results_qoe_values[QUEUE_THRESHOLD_TO_SIMP],
-            marker='o',
-            label=f'Порог: {QUEUE_THRESHOLD_TO_SIMP}'
-        )
-
+    add_threshold_lines(ax, lines('arrival_rate', 'waiting_time', 'qoe'), queue_thresholds)
     ax.set_xlabel('Интенсивность нагрузки')
     ax.set_ylabel('Средняя задержка')
     ax.set_zlabel('Среднее QoE')
     ax.set_title('Зависимость QoE и задержки от нагрузки')
-    ax.legend()
-    plt.show()
+    fig.savefig(os.path.join(output_dir, 'qoe_waiting_time_3d.png'))
+
+    if not HEADLESS:
+        plt.show()
+
+
+def simulate(validate=False, verbose=False, output=RESULTS_FILE, input_file=None):
+    """
+    Расчёт метрик контакт-центра (см. run_sweep.sweep) с сохранением таблицы результатов в Parquet.
+    Если задан input_file, расчёт не выполняется: таблица строится по файлу .npz, сохранённому
+    run_sweep.py (например, под PyPy). Возвращает таблицу результатов.
+    """
+    results = load_results(input_file) if input_file else sweep(validate=validate, verbose=verbose)
+    df = results_frame(results)
+    df.to_parquet(output)
+    return df
+
+
+def run_simulation(validate=False, verbose=False):
+    """
+    Функция для запуска симуляции контакт-центра с динамическим переключением между
+    базовыми и упрощёнными нейросетевыми агентами, используя управление доступностью агентов.
+    QoE вычисляется как функция от типа модели и времени ожидания.
+
+    По умолчанию метрики считаются аналитически (M/M/c, формула Эрланга C). При validate=True
+    дополнительно запускается имитационная модель SimPy, и графики строятся по её результатам;
+    при verbose=True выводится журнал переключений типов агентов.
+    Результаты не сохраняются на диск, поэтому pyarrow для этого запуска не нужен.
+    """
+    plot_sweep(results_frame(sweep(validate=validate, verbose=verbose)))
+
 
 if __name__ == "__main__":
-    run_simulation()
+    parser = argparse.ArgumentParser(description='Симуляция контакт-центра с нейросетевыми агентами. '
+                                                 'Без команды выполняется расчёт и построение графиков.')
+    parser.add_argument('--validate', action='store_true',
+                        help='проверить аналитическую модель имитационной симуляцией SimPy')
+    parser.add_argument('--verbose', action='store_true',
+                        help='вывести журнал переключений типов агентов (только с --validate)')
+    subparsers = parser.add_subparsers(dest='command')
+
+    simulate_parser = subparsers.add_parser('simulate', help='рассчитать метрики и сохранить их в Parquet')
+    # SUPPRESS: флаги можно указать и до, и после команды, не затирая друг друга
+    simulate_parser.add_argument('--validate', action='store_true', default=argparse.SUPPRESS,
+                                 help='проверить аналитическую модель имитационной симуляцией SimPy')
+    simulate_parser.add_argument('--verbose', action='store_true', default=argparse.SUPPRESS,
+                                 help='вывести журнал переключений типов агентов (только с --validate)')
+    simulate_parser.add_argument('--output', default=RESULTS_FILE,
+                                 help=f'файл результатов (по умолчанию {RESULTS_FILE})')
+    simulate_parser.add_argument('--input', nargs='?', const=NPZ_RESULTS_FILE,
+                                 help='не считать заново, а перевести в Parquet результаты run_sweep.py '
+                                      f'(по умолчанию {NPZ_RESULTS_FILE})')
+
+    plot_parser = subparsers.add_parser('plot', help='построить графики по сохранённым результатам')
+    plot_parser.add_argument('--input', default=RESULTS_FILE,
+                             help=f'файл результатов (по умолчанию {RESULTS_FILE})')
+    plot_parser.add_argument('--output-dir', default=PLOTS_DIR,
+                             help=f'каталог для графиков (по умолчанию {PLOTS_DIR})')
+    args = parser.parse_args()
+
+    if args.command == 'simulate':
+        simulate(validate=args.validate, verbose=args.verbose, output=args.output, input_file=args.input)
+    elif args.command == 'plot':
+        plot_sweep(pd.read_parquet(args.input), output_dir=args.output_dir)
+    else:
+        run_simulation(validate=args.validate, verbose=args.verbose)
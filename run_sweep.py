@@ -0,0 +1,447 @@
+"""
+Расчёт метрик контакт-центра (аналитика M/M/c и имитационная модель SimPy) без зависимости
+от matplotlib. Может запускаться под PyPy: pypy3 run_sweep.py --validate
+Результаты сохраняются в файл .npz (только NumPy, без pandas и pyarrow); в Parquet их переводит
+команда simulate --input скрипта 001_resourse_control_discr_sim_mod.py, графики строит его команда plot.
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import simpy
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # Без Numba (например, под PyPy) числовые ядра выполняются как обычный Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Параметры симуляции
+SIM_TIME = 1000  # Продолжительность симуляции (единицы времени)
+NUM_AGENTS_FULL = 10  # Количество агентов при использовании базовых моделей
+NUM_AGENTS_SIMPLIFIED = 20  # Количество агентов при использовании упрощённых моделей
+AVG_PROCESSING_TIME = 1  # Среднее время обработки запроса (единицы времени)
+QUEUE_THRESHOLD_TO_BASE = 0  # Порог для переключения на базовые агенты
+QoE_FULL_BASE = 1.0  # Базовое QoE при использовании базовых моделей
+QoE_SIMPLIFIED_BASE = 0.8  # Базовое QoE при использовании упрощённых моделей
+ALPHA = 0.05  # Коэффициент влияния задержки на QoE
+MONITOR_INTERVAL = 5  # Интервал записи числа дополнительных агентов и QoE (только для графиков)
+RESULTS_FILE = 'sweep.npz'  # Файл с сохранёнными результатами расчёта
+
+# Метрики в последней оси массива результатов
+METRICS = ('waiting_time', 'qoe', 'simplified_agents')
+
+
+@njit(cache=True, fastmath=True)
+def erlang_c(num_agents, offered_load):
+    """
+    Вероятность ожидания в системе M/M/c (формула Эрланга C).
+    Для перегруженной системы (нагрузка на агента >= 1) вероятность ожидания равна 1.
+    """
+    # Рекуррентная формула Эрланга B: B(0) = 1, B(k) = a * B(k-1) / (k + a * B(k-1))
+    erlang_b = 1.0
+    for k in range(1, num_agents + 1):
+        erlang_b = offered_load * erlang_b / (k + offered_load * erlang_b)
+
+    rho = offered_load / num_agents
+    if rho >= 1:
+        return 1.0
+    return erlang_b / (1 - rho * (1 - erlang_b))
+
+
+@njit(cache=True)
+def erlang_c_array(num_agents, offered_loads):
+    """Формула Эрланга C для массива значений нагрузки."""
+    prob_wait = np.empty(offered_loads.shape[0])
+    for i in range(offered_loads.shape[0]):
+        prob_wait[i] = erlang_c(num_agents, offered_loads[i])
+    return prob_wait
+
+
+def mean_waiting_time(num_agents, arrival_rates, prob_wait):
+    """
+    Среднее время ожидания в очереди M/M/c. Для перегруженной системы стационарного режима
+    нет, поэтому средняя очередь на интервале SIM_TIME оценивается жидкостным приближением
+    (линейный рост), а при критической нагрузке — диффузионным (рост как корень из времени).
+    """
+    mu = 1.0 / AVG_PROCESSING_TIME
+    service_rate = num_agents * mu
+    stable = arrival_rates < service_rate
+    with np.errstate(divide='ignore'):
+        wq_stable = prob_wait / (service_rate - arrival_rates)
+
+    queue_fluid = (arrival_rates - service_rate) * SIM_TIME / 2
+    queue_diffusion = 2 / 3 * np.sqrt((arrival_rates + service_rate) * 2 * SIM_TIME / np.pi)
+    wq_overload = np.maximum(queue_fluid, queue_diffusion) / service_rate
+    return np.where(stable, wq_stable, wq_overload)
+
+
+def analytic_threshold(QUEUE_THRESHOLD_TO_SIMP, arrival_rates):
+    """
+    Аналитическая оценка средних метрик (задержка, QoE, число дополнительных агентов)
+    для всех уровней нагрузки сразу по модели M/M/c. Упрощённые агенты включаются,
+    если ожидаемая длина очереди при базовых агентах превышает порог.
+    Возвращает массив формы (число уровней нагрузки, 3); порядок метрик — METRICS.
+
+    Это грубое стационарное приближение, не учитывающее переключения туда и обратно, поэтому
+    оно заметно расходится с имитационной моделью (SIM_TIME = 1000): число дополнительных
+    агентов — ступенька 0/10 вместо плавного роста (расхождение до ~8.8 при нагрузке 10),
+    задержка — до ~2.7 (при нагрузке 20 оценка 5.32 против 2.58 в симуляции), QoE — до ~0.16.
+    Точные метрики даёт только имитационная модель (sweep с validate=True).
+    """
+    lam = np.asarray(arrival_rates, dtype=float)
+    mu = 1.0 / AVG_PROCESSING_TIME
+    offered_load = lam / mu
+
+    # Ожидаемая длина очереди при базовых агентах: Lq = C * rho / (1 - rho)
+    rho_full = offered_load / NUM_AGENTS_FULL
+    prob_wait_full = erlang_c_array(NUM_AGENTS_FULL, offered_load)
+    with np.errstate(divide='ignore'):
+        queue_length_full = np.where(rho_full < 1, prob_wait_full * rho_full / (1 - rho_full), np.inf)
+    simplified = queue_length_full > QUEUE_THRESHOLD_TO_SIMP
+
+    num_agents = np.where(simplified, NUM_AGENTS_SIMPLIFIED, NUM_AGENTS_FULL)
+    prob_wait = np.where(simplified, erlang_c_array(NUM_AGENTS_SIMPLIFIED, offered_load), prob_wait_full)
+    waiting_times = mean_waiting_time(num_agents, lam, prob_wait)
+
+    base_qoe = np.where(simplified, QoE_SIMPLIFIED_BASE, QoE_FULL_BASE)
+    qoe_values = np.maximum(0, base_qoe - ALPHA * waiting_times)  # QoE не может быть отрицательным
+    simplified_agents = np.where(simplified, NUM_AGENTS_SIMPLIFIED - NUM_AGENTS_FULL, 0)
+
+    return np.column_stack((waiting_times, qoe_values, simplified_agents))
+
+
+def set_agent_capacity(agent_resource, capacity):
+    """
+    Изменение числа доступных агентов (ёмкости ресурса SimPy) во время симуляции.
+    При увеличении ёмкости к агентам сразу допускаются все ожидающие запросы, которым хватает
+    мест (в порядке очереди), при уменьшении уже обслуживаемые запросы дорабатывают, а новые ждут
+    освобождения агентов. Очередь просматривается только при увеличении ёмкости — при уменьшении
+    свободных мест не прибавляется, и допускать некого.
+    """
+    increased = capacity > agent_resource.capacity
+    agent_resource._capacity = capacity
+    if increased:
+        # _trigger_put допускает к ресурсу не больше одного запроса за вызов
+        while agent_resource.queue and agent_resource.count < capacity:
+            agent_resource._trigger_put(None)
+
+
+@dataclass(slots=True)
+class SimState:
+    """Состояние одной симуляции, общее для всех процессов SimPy."""
+    env: simpy.Environment
+    agent_resource: simpy.Resource  # Ресурс агентов; ёмкость равна текущему количеству доступных агентов
+    queue_threshold: int  # Порог переключения на упрощённые агенты
+    inter_arrival_times: np.ndarray  # Интервалы между поступлениями на весь горизонт симуляции
+    processing_times: np.ndarray  # Времена обработки запросов в порядке поступления
+    waiting_times: np.ndarray  # Буфер времён ожидания (заполнен до served)
+    qoe_values: np.ndarray  # Буфер значений QoE (заполнен до served)
+    verbose: bool = False
+    agent_type: str = 'full'  # Текущий тип агентов ('full' или 'simplified')
+    served: int = 0  # Количество обслуженных запросов
+    qoe_sum: float = 0.0  # Накопленная сумма QoE для скользящего среднего
+    switches: int = 0  # Количество переключений типов агентов
+    last_switch_time: float = 0.0  # Время последнего переключения типов агентов
+    simplified_agents_time: float = 0.0  # Интеграл числа дополнительных агентов по времени до last_switch_time
+    events_log: list = field(default_factory=list)  # Журнал переключений типов агентов
+    time_points: list = field(default_factory=list)
+    simplified_agent_counts_over_time: list = field(default_factory=list)
+    time_qoe: list = field(default_factory=list)
+    qoe_over_time: list = field(default_factory=list)
+
+
+def process_request(state, request_id, processing_time):
+    """Процесс обработки одного запроса с заранее сгенерированным временем обработки."""
+    env = state.env
+    arrival_time = env.now  # Время прибытия запроса
+
+    with state.agent_resource.request() as req:
+        update_agent_type(state)  # Запрос мог встать в очередь
+        yield req  # Ожидание доступного агента в очереди ресурса
+        update_agent_type(state)  # Запрос покинул очередь
+
+        waiting_time = env.now - arrival_time  # Время ожидания запроса
+
+        # Определение базового QoE в зависимости от типа агента
+        if state.agent_type == 'full':
+            base_qoe = QoE_FULL_BASE
+        else:
+            base_qoe = QoE_SIMPLIFIED_BASE
+
+        # Вычисление QoE с учётом задержки
+        qoe = max(0, base_qoe - ALPHA * waiting_time)  # QoE не может быть отрицательным
+
+        # Сохранение времени ожидания и QoE (буферы рассчитаны на все сгенерированные запросы)
+        served = state.served
+        state.waiting_times[served] = waiting_time
+        state.qoe_values[served] = qoe
+        state.qoe_sum += qoe
+        state.served = served + 1
+
+        yield env.timeout(processing_time)  # Обработка запроса
+
+    update_agent_type(state)  # Агент освободился
+
+
+def generate_requests(state):
+    """Процесс генерации входящих запросов по заранее сгенерированным интервалам."""
+    env = state.env
+    request_times = zip(state.inter_arrival_times.tolist(), state.processing_times.tolist())
+    for request_id, (inter_arrival_time, processing_time) in enumerate(request_times, start=1):
+        yield env.timeout(inter_arrival_time)
+        env.process(process_request(state, request_id, processing_time))  # Запуск процесса обработки запроса
+
+
+def num_simplified_agents(state):
+    """Текущее число дополнительных агентов (сверх базовых)."""
+    return state.agent_resource.capacity - NUM_AGENTS_FULL if state.agent_type == 'simplified' else 0
+
+
+def accumulate_simplified_agents(state, now):
+    """
+    Добавление к интегралу числа дополнительных агентов отрезка с последнего переключения до now.
+    Вызывается перед каждым переключением и в конце симуляции: между переключениями число
+    дополнительных агентов постоянно, поэтому среднее по времени получается точным.
+    """
+    state.simplified_agents_time += num_simplified_agents(state) * (now - state.last_switch_time)
+    state.last_switch_time = now
+
+
+def update_agent_type(state):
+    """
+    Переключение типов агентов по длине очереди. Вызывается при каждом изменении очереди
+    или числа занятых агентов (постановка запроса, начало и окончание обслуживания).
+    """
+    agent_resource = state.agent_resource
+    queue_length = len(agent_resource.queue)  # Текущая длина очереди
+
+    # Переключение на упрощённые агенты
+    if queue_length > state.queue_threshold and state.agent_type != 'simplified':
+        accumulate_simplified_agents(state, state.env.now)
+        state.agent_type = 'simplified'
+        set_agent_capacity(agent_resource, NUM_AGENTS_SIMPLIFIED)  # Увеличиваем доступное количество агентов
+        state.switches += 1
+        if state.verbose:
+            state.events_log.append((state.env.now, state.agent_type))
+    # Переключение обратно на базовые агенты
+    elif (queue_length <= QUEUE_THRESHOLD_TO_BASE and state.agent_type != 'full' and
+          agent_resource.count <= NUM_AGENTS_FULL):
+        accumulate_simplified_agents(state, state.env.now)
+        state.agent_type = 'full'
+        set_agent_capacity(agent_resource, NUM_AGENTS_FULL)  # Уменьшаем доступное количество агентов
+        state.switches += 1
+        if state.verbose:
+            state.events_log.append((state.env.now, state.agent_type))
+
+
+def monitor_queue(state):
+    """Процесс записи числа дополнительных агентов и текущего среднего QoE для графиков."""
+    while True:
+        state.time_points.append(state.env.now)
+        state.simplified_agent_counts_over_time.append(num_simplified_agents(state))
+
+        current_qoe = state.qoe_sum / state.served if state.served else QoE_FULL_BASE
+        state.time_qoe.append(state.env.now)
+        state.qoe_over_time.append(current_qoe)
+
+        yield state.env.timeout(MONITOR_INTERVAL)
+
+
+def draw_requests(REQUEST_ARRIVAL_RATE):
+    """
+    Генерация интервалов между поступлениями и времён обработки на весь горизонт SIM_TIME.
+    Зерно генератора зависит только от нагрузки: при разных порогах поток запросов одинаков,
+    и результат не зависит от распределения задач по процессам.
+    """
+    rng = np.random.default_rng(abs(hash(REQUEST_ARRIVAL_RATE)))
+
+    # Ожидаемое число поступлений с запасом; если его не хватило до конца симуляции, поток дополняется
+    n_req_est = int(REQUEST_ARRIVAL_RATE * SIM_TIME * 1.3) + 1
+    inter_arrival_times = rng.exponential(1.0 / REQUEST_ARRIVAL_RATE, n_req_est)
+    while inter_arrival_times.sum() < SIM_TIME:
+        inter_arrival_times = np.concatenate((inter_arrival_times, rng.exponential(1.0 / REQUEST_ARRIVAL_RATE, n_req_est)))
+    processing_times = rng.exponential(AVG_PROCESSING_TIME, inter_arrival_times.shape[0])
+
+    return inter_arrival_times, processing_times
+
+
+def run_one(QUEUE_THRESHOLD_TO_SIMP, REQUEST_ARRIVAL_RATE, verbose=False, requests=None, buffers=None):
+    """
+    Имитационное моделирование (SimPy) контакт-центра для одного значения порога и одного
+    уровня нагрузки. Возвращает среднюю задержку, среднее QoE, среднее число дополнительных агентов,
+    число переключений типов агентов и журнал переключений (время, тип агентов), который
+    заполняется только при verbose=True.
+
+    requests — результат draw_requests для этой нагрузки (по умолчанию генерируется заново);
+    buffers — пара массивов (времена ожидания, QoE) не короче числа запросов для повторного
+    использования между симуляциями (по умолчанию выделяется заново).
+    """
+    if requests is None:
+        requests = draw_requests(REQUEST_ARRIVAL_RATE)
+    inter_arrival_times, processing_times = requests
+    if buffers is None:
+        buffers = (np.empty(inter_arrival_times.shape[0]), np.empty(inter_arrival_times.shape[0]))
+
+    # Создание среды симуляции и ресурса агентов
+    env = simpy.Environment()
+    state = SimState(
+        env=env,
+        agent_resource=simpy.Resource(env, capacity=NUM_AGENTS_FULL),
+        queue_threshold=QUEUE_THRESHOLD_TO_SIMP,
+        inter_arrival_times=inter_arrival_times,
+        processing_times=processing_times,
+        waiting_times=buffers[0],  # Буферы на запросы выделяются заранее
+        qoe_values=buffers[1],
+        verbose=verbose,
+    )
+
+    # Запуск процессов симуляции
+    env.process(generate_requests(state))
+    env.process(monitor_queue(state))
+
+    # Запуск симуляции до заданного времени
+    env.run(until=SIM_TIME)
+
+    # Вычисление средних метрик для текущей нагрузки
+    served = state.served
+    average_qoe = float(state.qoe_values[:served].mean()) if served else QoE_FULL_BASE
+    average_waiting_time = float(state.waiting_times[:served].mean()) if served else 0
+    accumulate_simplified_agents(state, SIM_TIME)  # Закрытие последнего отрезка до конца симуляции
+    average_simplified_agents = state.simplified_agents_time / SIM_TIME  # Среднее по времени
+
+    return average_waiting_time, average_qoe, average_simplified_agents, state.switches, state.events_log
+
+
+@contextmanager
+def gc_paused():
+    """
+    Отключение циклического сборщика мусора на время серии симуляций: каждая симуляция
+    создаёт десятки тысяч короткоживущих событий SimPy, и сборки поколений лишь тормозят её.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def run_rate(REQUEST_ARRIVAL_RATE, queue_thresholds, verbose=False):
+    """
+    Имитационное моделирование для одного уровня нагрузки по всем значениям порога.
+    Пороги перебираются по возрастанию: если при пороге не было ни одного переключения,
+    очередь его ни разу не превысила, и при больших порогах (с тем же потоком запросов)
+    симуляция пройдёт точно так же, поэтому её результат используется повторно.
+    Поток запросов генерируется, а буферы метрик выделяются один раз на всю серию.
+    Возвращает результаты run_one в порядке queue_thresholds.
+    """
+    requests = draw_requests(REQUEST_ARRIVAL_RATE)
+    n_requests = requests[0].shape[0]
+    buffers = (np.empty(n_requests), np.empty(n_requests))
+
+    results = {}
+    no_switch_result = None
+    with gc_paused():
+        for QUEUE_THRESHOLD_TO_SIMP in sorted(queue_thresholds):
+            if no_switch_result is None:
+                results[QUEUE_THRESHOLD_TO_SIMP] = run_one(QUEUE_THRESHOLD_TO_SIMP, REQUEST_ARRIVAL_RATE, verbose,
+                                                           requests, buffers)
+                if results[QUEUE_THRESHOLD_TO_SIMP][3] == 0:
+                    no_switch_result = results[QUEUE_THRESHOLD_TO_SIMP]
+            else:
+                results[QUEUE_THRESHOLD_TO_SIMP] = no_switch_result
+
+    return [results[t] for t in queue_thresholds]
+
+
+def simulate_sweep(queue_thresholds, arrival_rates, verbose=False):
+    """
+    Параллельное имитационное моделирование по всем сочетаниям порога и уровня нагрузки.
+    Уровни нагрузки независимы, поэтому распределяются по процессам (по одному на ядро).
+    Возвращает массив метрик формы (число порогов, число уровней нагрузки, 3).
+    При verbose=True после завершения всех симуляций выводится журнал переключений.
+    """
+    tasks = [(r, queue_thresholds, verbose) for r in arrival_rates]
+    with multiprocessing.Pool(processes=os.cpu_count()) as pool:
+        rate_results = pool.starmap(run_rate, tasks)
+
+    results = np.empty((len(queue_thresholds), len(arrival_rates), len(METRICS)))
+    for j, threshold_results in enumerate(rate_results):
+        for i, r in enumerate(threshold_results):
+            results[i, j] = r[:len(METRICS)]
+
+    if verbose:
+        for i, QUEUE_THRESHOLD_TO_SIMP in enumerate(queue_thresholds):
+            print(f"\nСимуляция для QUEUE_THRESHOLD_TO_SIMP = {QUEUE_THRESHOLD_TO_SIMP}\n")
+            for REQUEST_ARRIVAL_RATE, threshold_results in zip(arrival_rates, rate_results):
+                for time, agent_type in threshold_results[i][4]:
+                    name = 'упрощённые' if agent_type == 'simplified' else 'базовые'
+                    print(f"Переключение на {name} агенты в момент времени {time} при нагрузке {REQUEST_ARRIVAL_RATE}")
+
+    return results
+
+
+def sweep(validate=False, verbose=False):
+    """
+    Расчёт средних метрик контакт-центра по всем значениям порога и уровням нагрузки.
+
+    По умолчанию метрики считаются аналитически (M/M/c, формула Эрланга C). При validate=True
+    дополнительно запускается имитационная модель SimPy, и возвращаются её результаты;
+    при verbose=True выводится журнал переключений типов агентов.
+    Возвращает словарь с уровнями нагрузки, порогами и массивом метрик 'results' формы
+    (число порогов, число уровней нагрузки, 3); порядок метрик — METRICS.
+    """
+    # Уровни нагрузки для симуляции
+    arrival_rates = [0.1 * i for i in range(1, 10)] + list(range(1, 21))  # От 0.1 до 20
+
+    # Значения порога для переключения на упрощённые агенты
+    queue_thresholds = [1, 3, 5, 7, 10]  # Можно изменить или добавить значения
+
+    # Результаты по всем порогам: [порог, уровень нагрузки, метрика]
+    results = np.empty((len(queue_thresholds), len(arrival_rates), len(METRICS)))
+    for i, QUEUE_THRESHOLD_TO_SIMP in enumerate(queue_thresholds):
+        results[i] = analytic_threshold(QUEUE_THRESHOLD_TO_SIMP, arrival_rates)
+
+    if validate:
+        sim_results = simulate_sweep(queue_thresholds, arrival_rates, verbose)
+        deviation = np.max(np.abs(sim_results - results), axis=1)  # Максимум по уровням нагрузки
+        for QUEUE_THRESHOLD_TO_SIMP, (waiting, qoe, simplified) in zip(queue_thresholds, deviation):
+            print(f"Порог {QUEUE_THRESHOLD_TO_SIMP}: макс. расхождение с аналитикой — "
+                  f"задержка {waiting:.3f}, QoE {qoe:.3f}, доп. агенты {simplified:.3f}")
+        results = sim_results
+
+    return {
+        'arrival_rates': arrival_rates,
+        'queue_thresholds': queue_thresholds,
+        'results': results,
+    }
+
+
+def save_results(results, path=RESULTS_FILE):
+    """Сохранение результатов sweep в файл .npz (уровни нагрузки, пороги и массив метрик)."""
+    np.savez(path, arrival_rates=results['arrival_rates'], queue_thresholds=results['queue_thresholds'],
+             results=results['results'])
+
+
+def load_results(path=RESULTS_FILE):
+    """Загрузка результатов, сохранённых save_results, в том же виде, что возвращает sweep."""
+    with np.load(path) as data:
+        return {name: data[name] for name in ('arrival_rates', 'queue_thresholds', 'results')}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Расчёт метрик контакт-центра с нейросетевыми агентами (без графиков)')
+    parser.add_argument('--validate', action='store_true',
+                        help='проверить аналитическую модель имитационной симуляцией SimPy')
+    parser.add_argument('--verbose', action='store_true',
+                        help='вывести журнал переключений типов агентов (только с --validate)')
+    parser.add_argument('--output', default=RESULTS_FILE,
+                        help=f'файл для сохранения результатов (по умолчанию {RESULTS_FILE})')
+    args = parser.parse_args()
+
+    save_results(sweep(validate=args.validate, verbose=args.verbose), args.output)
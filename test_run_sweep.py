@@ -0,0 +1,27 @@
+import pytest
+import simpy
+
+import run_sweep
+from run_sweep import run_one, run_rate, set_agent_capacity
+
+
+def test_set_agent_capacity_admits_all_queued_requests():
+    """При увеличении ёмкости к агентам допускаются все ожидающие запросы, которым хватает мест."""
+    env = simpy.Environment()
+    agent_resource = simpy.Resource(env, capacity=10)
+    requests = [agent_resource.request() for _ in range(25)]
+    assert agent_resource.count == 10 and len(agent_resource.queue) == 15
+
+    set_agent_capacity(agent_resource, 20)
+
+    assert agent_resource.count == 20
+    assert len(agent_resource.queue) == 5
+    assert all(req.triggered for req in requests[:20])
+
+
+@pytest.mark.parametrize('rate', [0.5, 3, 6, 8, 9])
+def test_run_rate_matches_independent_runs(monkeypatch, rate):
+    """Повторное использование результатов без переключений не меняет метрик run_rate."""
+    monkeypatch.setattr(run_sweep, 'SIM_TIME', 200)
+    queue_thresholds = [1, 3, 5, 7, 10]
+    assert run_rate(rate, queue_thresholds) == [run_one(t, rate) for t in queue_thresholds]